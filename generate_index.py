@@ -1,16 +1,34 @@
-import json
+import gzip
+from html import escape
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:  # fall back to ujson when orjson is unavailable
+    orjson = None
+    import ujson
+
 INPUT_JSON = Path("workouts_by_category.json")
 OUTPUT_HTML = Path("index.html")
+OUTPUT_HTML_GZ = Path("index.html.gz")  # precompressed copy for static hosts
+
+DIFFICULTY_ORDER = ("Beginner", "Intermediate", "Advanced", "Hard", "Insane")
+DIFFICULTY_SET = frozenset(DIFFICULTY_ORDER)
+STROKE_SET = frozenset({"Freestyle", "Backstroke", "Breaststroke", "Butterfly", "IM", "Stroke"})
 
 
 def categorize_filters(categories):
-    distance = [c for c in categories if any(x in c for x in ("-", "+"))]
-    difficulty_order = ["Beginner", "Intermediate", "Advanced", "Hard", "Insane"]
-    difficulty = [c for c in difficulty_order if c in categories]
-    stroke = [c for c in categories if c in ("Freestyle", "Backstroke", "Breaststroke", "Butterfly", "IM", "Stroke")]
-    other = [c for c in categories if c not in distance + difficulty + stroke]
+    distance, difficulty, stroke, other = [], [], [], []
+    for c in categories:
+        if "-" in c or "+" in c:
+            distance.append(c)
+        elif c in DIFFICULTY_SET:
+            difficulty.append(c)
+        elif c in STROKE_SET:
+            stroke.append(c)
+        else:
+            other.append(c)
+    difficulty.sort(key=DIFFICULTY_ORDER.index)
     return {
         "Distance": distance,
         "Difficulty": difficulty,
@@ -19,50 +37,7 @@ def categorize_filters(categories):
     }
 
 
-def build_html(data):
-    all_categories = sorted({c for v in data.values() for c in v.get("Distance", []) + v.get("Difficulty", []) + v.get("Stroke", []) + v.get("Other", [])})
-    grouped = categorize_filters(all_categories)
-
-    filters_html = ""
-    for section, cats in grouped.items():
-        if not cats:
-            continue
-        filters_html += f"<h3>{section}</h3>\n"
-        for c in cats:
-            filters_html += (
-                f'<label class="category-filter">'
-                f'<input type="checkbox" value="{c}" onchange="filter()"> {c}</label>\n'
-            )
-
-    rows_html = ""
-    for name, info in sorted(data.items()):
-        link = info.get("url")
-        link_html = f'<a href="{link}" target="_blank">{name}</a>' if link else name
-        distance = ", ".join(info.get("Distance", []))
-        difficulty = ", ".join(info.get("Difficulty", []))
-        stroke = ", ".join(info.get("Stroke", []))
-        other = ", ".join(info.get("Other", []))
-        total_distance = info.get("TotalDistance", "")
-        summary_full = info.get("summary", "")
-        if len(summary_full) > 150:
-            summary_display = summary_full[:150] + "…"
-            truncated_attr = 'data-truncated="true"'
-        else:
-            summary_display = summary_full
-            truncated_attr = 'data-truncated="false"'
-        rows_html += (
-            f"<tr>"
-            f"<td>{link_html}</td>"
-            f"<td>{distance}</td>"
-            f"<td>{difficulty}</td>"
-            f"<td>{stroke}</td>"
-            f"<td>{other}</td>"
-            f"<td>{total_distance}</td>"
-            f'<td class="summary" {truncated_attr} data-full="{summary_full}">{summary_display}</td>'
-            f"</tr>\n"
-        )
-
-    return f"""<!DOCTYPE html>
+HEADER_TMPL = """<!DOCTYPE html>
 <html>
 <head>
 <meta charset="utf-8">
@@ -74,7 +49,6 @@ th, td {{ border: 1px solid #ccc; padding: 6px; text-align: left; vertical-align
 th {{ background: #f5f5f5; }}
 .category-filter {{ display: inline-block; margin: 5px 10px 5px 0; font-size: 1.1em; }}
 .category-filter input {{ transform: scale(1.5); margin-right: 8px; vertical-align: middle; }}
-.hidden {{ display: none; }}
 a {{ color: #0073e6; text-decoration: none; }}
 a:hover {{ text-decoration: underline; }}
 
@@ -108,7 +82,8 @@ td.summary[data-truncated="true"]:hover::after {{
     table {{ display: block; width: 100%; }}
     th, td {{ white-space: normal; }}
 }}
-</style>
+
+{filter_css}</style>
 </head>
 <body>
 <h2>Swim Workouts</h2>
@@ -117,7 +92,7 @@ td.summary[data-truncated="true"]:hover::after {{
   {filters_html}
 </div>
 
-<div id="workout-count" style="margin:10px 0; font-weight:bold;">Total Workouts: {len(data)}</div>
+<div id="workout-count" style="margin:10px 0; font-weight:bold;">Total Workouts: {count}</div>
 
 <div class="table-container">
 <table id="workouts">
@@ -132,37 +107,154 @@ td.summary[data-truncated="true"]:hover::after {{
       <th>Summary</th>
     </tr>
   </thead>
-  <tbody>{rows_html}</tbody>
+  <tbody>"""
+
+SECTION_TMPL = "<h3>{section}</h3>\n"
+
+FILTER_TMPL = (
+    '<label class="category-filter">'
+    '<input type="checkbox" value="{category}" data-filter="{index}" onchange="filter()"> {category}</label>\n'
+)
+
+# One rule per category: while "filter-N" is set on the table, rows lacking that category are hidden
+FILTER_CSS_TMPL = '#workouts.filter-{index} tbody tr:not([data-cats*="|{css_category}|"]) {{ display: none; }}\n'
+
+ROW_TMPL = (
+    '<tr data-name="{name}" data-cats="{cats}">'
+    "<td>{link}</td>"
+    "<td>{distance}</td>"
+    "<td>{difficulty}</td>"
+    "<td>{stroke}</td>"
+    "<td>{other}</td>"
+    "<td>{total_distance}</td>"
+    '<td class="summary" {truncated_attr}>{summary_display}</td>'
+    "</tr>\n"
+)
+
+TABLE_END_TMPL = """</tbody>
 </table>
 </div>
 
-<script>
-function filter() {{
-  const selected = [...document.querySelectorAll('#filters input:checked')].map(c => c.value);
-  const rows = document.querySelectorAll('#workouts tbody tr');
-  let visibleCount = 0;
-  rows.forEach(r => {{
-    const cats = [
-        r.cells[1].innerText,
-        r.cells[2].innerText,
-        r.cells[3].innerText,
-        r.cells[4].innerText
-    ].join(',').split(',').map(c => c.trim()).filter(Boolean);
-    const match = selected.every(s => cats.includes(s));
-    const hidden = selected.length && !match;
-    r.classList.toggle('hidden', hidden);
-    if (!hidden) visibleCount += 1;
-  }});
+"""
+
+# Full text of truncated summaries, keyed by workout name; copied into data-full on first hover
+SUMMARIES_TMPL = '<script id="summaries" type="application/json">{summaries_json}</script>\n'
+
+FOOTER_TMPL = """<script>
+const S = JSON.parse(document.getElementById('summaries').textContent);
+document.querySelector('#workouts tbody').addEventListener('mouseover', e => {
+  const cell = e.target.closest('td.summary[data-truncated="true"]');
+  if (cell && !cell.dataset.full) cell.dataset.full = S[cell.parentElement.dataset.name];
+});
+
+function filter() {
+  const checked = [...document.querySelectorAll('#filters input:checked')];
+  document.getElementById('workouts').className = checked.map(c => 'filter-' + c.dataset.filter).join(' ');
+  const visible = '#workouts tbody tr' + checked.map(c => '[data-cats*="' + CSS.escape('|' + c.value + '|') + '"]').join('');
+  const visibleCount = document.querySelectorAll(visible).length;
   document.getElementById("workout-count").innerText = "Total Workouts: " + visibleCount;
-}}
+}
 </script>
 </body>
 </html>"""
 
 
+def read_json(path):
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    return ujson.loads(path.read_bytes())
+
+
+def dumps_script_json(obj):
+    """Serialize obj for embedding inside a <script> element"""
+    if orjson is not None:
+        text = orjson.dumps(obj).decode("utf-8")
+    else:
+        text = ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+    # Keep "</script>" inside a string from closing the element early
+    return text.replace("</", "<\\/")
+
+
+def css_string_escape(value):
+    """Escape value for a double-quoted CSS string inside a <style> element"""
+    return (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\a ")
+        .replace("\r", "\\d ")
+        .replace("<", "\\3c ")
+    )
+
+
+def collect_categories(items):
+    return sorted({c for _, v in items for c in v.get("Distance", []) + v.get("Difficulty", []) + v.get("Stroke", []) + v.get("Other", [])})
+
+
+def write_html(items, all_categories, grouped, fp):
+    # Category names repeat across rows, so escape each one exactly once
+    esc = {c: escape(c) for c in all_categories}
+
+    filters_parts = []
+    css_parts = []
+    index = 0
+    for section, cats in grouped.items():
+        if not cats:
+            continue
+        filters_parts.append(SECTION_TMPL.format_map({"section": section}))
+        for c in cats:
+            filters_parts.append(FILTER_TMPL.format_map({"category": esc[c], "index": index}))
+            css_parts.append(FILTER_CSS_TMPL.format_map({
+                "index": index,
+                "css_category": css_string_escape(c),
+            }))
+            index += 1
+
+    fp.write(HEADER_TMPL.format(
+        filters_html="".join(filters_parts),
+        filter_css="".join(css_parts),
+        count=len(items),
+    ))
+    full_summaries = {}
+    for name, info in items:
+        link = info.get("url")
+        name_html = escape(name)
+        link_html = f'<a href="{escape(link)}" target="_blank">{name_html}</a>' if link else name_html
+        row_cats = info.get("Distance", []) + info.get("Difficulty", []) + info.get("Stroke", []) + info.get("Other", [])
+        summary_full = info.get("summary", "")
+        if len(summary_full) > 150:
+            summary_display = summary_full[:150] + "…"
+            full_summaries[name] = summary_full
+            truncated_attr = 'data-truncated="true"'
+        else:
+            summary_display = summary_full
+            truncated_attr = 'data-truncated="false"'
+        fp.write(ROW_TMPL.format_map({
+            "name": name_html,
+            "cats": "|" + "|".join(esc[c] for c in row_cats) + "|",
+            "link": link_html,
+            "distance": ", ".join(esc[c] for c in info.get("Distance", [])),
+            "difficulty": ", ".join(esc[c] for c in info.get("Difficulty", [])),
+            "stroke": ", ".join(esc[c] for c in info.get("Stroke", [])),
+            "other": ", ".join(esc[c] for c in info.get("Other", [])),
+            "total_distance": info.get("TotalDistance", ""),
+            "truncated_attr": truncated_attr,
+            "summary_display": escape(summary_display),
+        }))
+    fp.write(TABLE_END_TMPL)
+    fp.write(SUMMARIES_TMPL.format_map({"summaries_json": dumps_script_json(full_summaries)}))
+    fp.write(FOOTER_TMPL)
+
+
 def main():
-    data = json.loads(INPUT_JSON.read_text(encoding="utf-8"))
-    OUTPUT_HTML.write_text(build_html(data), encoding="utf-8")
+    data = read_json(INPUT_JSON)
+    # script.py writes sorted [name, info] pairs; older files are a name -> info dict
+    items = sorted(data.items()) if isinstance(data, dict) else data
+    all_categories = collect_categories(items)
+    grouped = categorize_filters(all_categories)
+    with OUTPUT_HTML.open("w", encoding="utf-8", buffering=1 << 20) as fp:
+        write_html(items, all_categories, grouped, fp)
+    # mtime=0 keeps the archive byte-identical when the HTML has not changed
+    OUTPUT_HTML_GZ.write_bytes(gzip.compress(OUTPUT_HTML.read_bytes(), compresslevel=6, mtime=0))
     print(f"✅ index.html regenerated from {INPUT_JSON}")
 
 
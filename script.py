@@ -3,127 +3,276 @@ Swim Dojo Workout Scraper (JSON Only, with Summary from workouts.json)
 ----------------------------------------------------------------------
 
 Generates:
-  - workouts_by_category.json (with summary field)
+  - workouts_by_category.json (sorted [name, info] pairs, with summary field)
   - total_distance_cache.json
+  - archive_cache.json (archive validators and parsed workout categories)
 """
 
-import json
+import argparse
+import asyncio
+import hashlib
+import re
 import sys
-from collections import defaultdict
+import time
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List, Mapping, Set
 
-import requests
-from bs4 import BeautifulSoup
+import aiohttp
+import ijson
+from selectolax.lexbor import LexborHTMLParser
+
+try:
+    ijson_backend = ijson.get_backend("yajl2_c")
+except ImportError:  # C extension not built; ijson picks the fastest available backend
+    ijson_backend = ijson
+
+try:
+    import orjson
+except ImportError:  # fall back to ujson when orjson is unavailable
+    orjson = None
+    import ujson
 
 BASE_URL = "https://www.swimdojo.com"
 ARCHIVE_URL = f"{BASE_URL}/archive"
 WORKOUTS_JSON = Path("workouts.json")  # source of summaries
 OUTPUT_JSON = Path("workouts_by_category.json")
 CACHE_JSON = Path("total_distance_cache.json")
+ARCHIVE_CACHE_JSON = Path("archive_cache.json")  # validators + parsed archive from the last run
+MISSING_TOTAL_TTL = 7 * 86400  # seconds before a page without a TOTAL is retried
+MAX_WORKERS = 16  # concurrent workout page fetches
+RETRIES = 2
+RETRY_BACKOFF = 0.2  # seconds, doubled after each failed attempt
+GONE_STATUSES = frozenset({404, 410})  # cached as a missing total rather than retried
+
+TOTAL_RE = re.compile(rb"TOTAL:\s*(\d[\d,]*)", re.IGNORECASE)
+
+DIFFICULTY_SET = frozenset({"Beginner", "Intermediate", "Advanced", "Hard", "Insane"})
+STROKE_SET = frozenset({"Freestyle", "Backstroke", "Breaststroke", "Butterfly", "IM", "Stroke"})
+
+
+# -------------------- JSON I/O -------------------- #
+def read_json(path: Path):
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    return ujson.loads(path.read_bytes())
+
+
+def write_json(path: Path, obj) -> None:
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        path.write_text(ujson.dumps(obj, indent=2, ensure_ascii=False, escape_forward_slashes=False), encoding="utf-8")
+
+
+def load_summaries(path: Path) -> Dict[str, str]:
+    """Stream title -> summary pairs out of workouts.json one record at a time"""
+    with path.open("rb") as f:
+        return {w["title"]: w.get("summary", "") for w in ijson_backend.items(f, "item")}
 
 
 # -------------------- Data Retrieval -------------------- #
-def fetch_archive_html(url: str) -> BeautifulSoup:
-    response = requests.get(url, timeout=10)
-    if response.status_code != 200:
-        sys.exit(f"❌ Failed to retrieve {url}. Status code: {response.status_code}")
-    return BeautifulSoup(response.text, "html.parser")
+async def fetch(session: aiohttp.ClientSession, url: str, headers: dict | None = None) -> tuple[int, Mapping[str, str], bytes]:
+    """GET url, retrying connection errors and timeouts with exponential backoff"""
+    for attempt in range(RETRIES + 1):
+        try:
+            async with session.get(url, headers=headers) as resp:
+                return resp.status, resp.headers, await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == RETRIES:
+                raise
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+
+async def fetch_archive_html(session: aiohttp.ClientSession, url: str, validators: dict) -> tuple[LexborHTMLParser | None, dict | None]:
+    """Conditionally fetch the archive; the tree is None when the archive is unchanged"""
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    status, response_headers, body = await fetch(session, url, headers)
+    if status == 304:
+        return None, None
+    if status != 200:
+        sys.exit(f"❌ Failed to retrieve {url}. Status code: {status}")
+    body_sha256 = hashlib.sha256(body).hexdigest()
+    fresh = {
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+        "body_sha256": body_sha256,
+    }
+    # Servers without validators still let us skip parsing an identical body
+    if body_sha256 == validators.get("body_sha256"):
+        return None, fresh
+    return LexborHTMLParser(body), fresh
 
 
-def extract_workouts_by_category(soup: BeautifulSoup) -> tuple[Dict[str, List[str]], Dict[str, str]]:
+def extract_workouts_by_category(tree: LexborHTMLParser) -> tuple[Dict[str, List[str]], Dict[str, Set[str]], Dict[str, str]]:
+    """Scrape category -> workouts and its inverse, workout -> categories, in one pass"""
     by_category: Dict[str, List[str]] = {}
+    by_workout: Dict[str, Set[str]] = {}
     workout_links: Dict[str, str] = {}
 
-    for group in soup.select("li.archive-group"):
-        category_tag = group.select_one(".archive-group-name-link")
+    for group in tree.css("li.archive-group"):
+        category_tag = group.css_first(".archive-group-name-link")
         if not category_tag:
             continue
 
-        category = category_tag.get_text(strip=True)
+        category = category_tag.text(strip=True)
         workouts: List[str] = []
 
-        for anchor in group.select(".archive-item a.archive-item-link"):
-            name = anchor.get_text(strip=True)
-            href = anchor.get("href")
+        for anchor in group.css(".archive-item a.archive-item-link"):
+            name = anchor.text(strip=True)
+            href = anchor.attributes.get("href")
             if href and href.startswith("/"):
                 href = f"{BASE_URL}{href}"
             if name:
                 workouts.append(name)
                 workout_links[name] = href
+                by_workout.setdefault(name, set()).add(category)
 
         by_category[category] = workouts
 
-    return by_category, workout_links
+    return by_category, by_workout, workout_links
 
 
 # -------------------- Cache -------------------- #
-def load_cache() -> dict:
+class DistanceCache(dict):
+    """Cache dict that records whether any entry was set since loading"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = False
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.dirty = True
+
+
+def load_cache() -> DistanceCache:
     if CACHE_JSON.exists():
-        raw_cache = json.loads(CACHE_JSON.read_text(encoding="utf-8"))
+        raw_cache = read_json(CACHE_JSON)
         # Convert old int-only format to dict format
-        fixed_cache = {}
+        fixed_cache = DistanceCache()
+        converted = False
         for k, v in raw_cache.items():
             if isinstance(v, dict):
                 fixed_cache[k] = v
             else:
                 fixed_cache[k] = {"TotalDistance": v, "Summary": ""}
+                converted = True
+        fixed_cache.dirty = converted
         return fixed_cache
-    return {}
+    return DistanceCache()
 
 
 def save_cache(cache: dict) -> None:
-    CACHE_JSON.write_text(json.dumps(cache, indent=2), encoding="utf-8")
-
-
-def fetch_workout_total(url: str, cache: dict, name: str) -> int | None:
-    """Fetch total distance from workout page, cached"""
-    if name in cache and "TotalDistance" in cache[name]:
-        return cache[name]["TotalDistance"]
-    try:
-        resp = requests.get(url, timeout=10)
-        if resp.status_code != 200:
-            return None
-        soup = BeautifulSoup(resp.text, "html.parser")
-        total_distance = None
-        for p in soup.find_all("p"):
-            text = p.get_text(strip=True)
-            if "TOTAL:" in text.upper():
-                digits = "".join(c for c in text if c.isdigit())
-                if digits:
-                    total_distance = int(digits)
-                    if name not in cache:
-                        cache[name] = {}
-                    cache[name]["TotalDistance"] = total_distance
-                    return total_distance
-        return None
-    except Exception:
+    write_json(CACHE_JSON, cache)
+
+
+def load_archive_cache() -> dict:
+    if ARCHIVE_CACHE_JSON.exists():
+        archive_cache = read_json(ARCHIVE_CACHE_JSON)
+        # Validators are only usable together with the parsed archive they describe
+        if "by_workout" in archive_cache and "workout_links" in archive_cache:
+            return archive_cache
+    return {}
+
+
+def save_archive_cache(validators: dict, by_workout: Dict[str, Iterable[str]], workout_links: Dict[str, str]) -> None:
+    by_workout_json = {w: sorted(cats) for w, cats in by_workout.items()}
+    write_json(ARCHIVE_CACHE_JSON, {**validators, "by_workout": by_workout_json, "workout_links": workout_links})
+
+
+def cached_total(entry: dict | None, now: float) -> tuple[bool, int | None]:
+    """Return (hit, total) for a cache entry; pages without a TOTAL expire after a TTL"""
+    if not entry or "TotalDistance" not in entry:
+        return False, None
+    total_distance = entry["TotalDistance"]
+    if total_distance is not None:
+        return True, total_distance
+    return now - entry.get("fetched_at", 0) < MISSING_TOTAL_TTL, None
+
+
+async def fetch_workout_total(session: aiohttp.ClientSession, sem: asyncio.Semaphore, url: str) -> int | None:
+    """Fetch total distance from workout page, raising on transient HTTP/network errors"""
+    async with sem:
+        status, _, body = await fetch(session, url)
+    if status in GONE_STATUSES:
+        # A missing page has no TOTAL either; cache it like one so it is not refetched every run
         return None
+    if status != 200:
+        raise aiohttp.ClientError(f"{url} returned status {status}")
+    match = TOTAL_RE.search(body)
+    if match:
+        return int(match.group(1).replace(b",", b""))
+    # Fall back to parsing when markup splits the label from the number
+    tree = LexborHTMLParser(body)
+    for p in tree.css("p"):
+        text = p.text(strip=True)
+        if "TOTAL:" in text.upper():
+            digits = "".join(c for c in text if c.isdigit())
+            if digits:
+                return int(digits)
+    return None
+
+
+async def fetch_workout_totals(session: aiohttp.ClientSession, links: Dict[str, str], names: List[str], cache: DistanceCache, refresh: bool = False) -> Dict[str, int | None]:
+    """Fetch total distances for many workouts concurrently, filling the cache"""
+    now = time.time()
+    totals: Dict[str, int | None] = {}
+    uncached = []
+    for name in names:
+        hit, total_distance = (False, None) if refresh else cached_total(cache.get(name), now)
+        if hit:
+            totals[name] = total_distance
+        elif links.get(name):
+            uncached.append(name)
+        else:
+            totals[name] = None
+
+    if not uncached:
+        return totals
+
+    sem = asyncio.Semaphore(MAX_WORKERS)
+    results = await asyncio.gather(
+        *(fetch_workout_total(session, sem, links[name]) for name in uncached),
+        return_exceptions=True,
+    )
+    for name, result in zip(uncached, results):
+        if isinstance(result, Exception):
+            # Transient failures are not cached so the next run retries them
+            totals[name] = None
+            continue
+        totals[name] = result
+        cache[name] = {**cache.get(name, {}), "TotalDistance": result, "fetched_at": now}
+    return totals
 
 
 # -------------------- Data Transformation -------------------- #
-def invert_category_mapping(by_category: Dict[str, List[str]]) -> Dict[str, List[str]]:
-    by_workout = defaultdict(set)
-    for category, workouts in by_category.items():
-        for workout in workouts:
-            by_workout[workout].add(category)
-    return {w: sorted(cats) for w, cats in by_workout.items()}
+def classify_category(category: str) -> str:
+    if "-" in category or "+" in category:
+        return "Distance"
+    if category in DIFFICULTY_SET:
+        return "Difficulty"
+    if category in STROKE_SET:
+        return "Stroke"
+    return "Other"
 
 
-def merge_workout_data(by_workout: Dict[str, List[str]], links: Dict[str, str], cache: dict, summaries: dict) -> Dict[str, dict]:
+def merge_workout_data(by_workout: Dict[str, Iterable[str]], links: Dict[str, str], totals: Dict[str, int | None], summaries: dict) -> Dict[str, dict]:
+    # Classify each distinct category once; per-workout lookups are then a single dict hit
+    section_of = {c: classify_category(c) for cats in by_workout.values() for c in cats}
     data = {}
     for name, cats in by_workout.items():
         url = links.get(name)
-        total_distance = fetch_workout_total(url, cache, name) if url else None
+        total_distance = totals[name]
         summary = summaries.get(name, "")
+        sections = {"Distance": [], "Difficulty": [], "Stroke": [], "Other": []}
+        for c in sorted(cats):
+            sections[section_of[c]].append(c)
         data[name] = {
-            "Distance": [c for c in cats if any(x in c for x in ("-", "+"))],
-            "Difficulty": [c for c in cats if c in ("Beginner", "Intermediate", "Advanced", "Hard", "Insane")],
-            "Stroke": [c for c in cats if c in ("Freestyle", "Backstroke", "Breaststroke", "Butterfly", "IM", "Stroke")],
-            "Other": [c for c in cats if c not in (
-                "Beginner", "Intermediate", "Advanced", "Hard", "Insane",
-                "Freestyle", "Backstroke", "Breaststroke", "Butterfly", "IM", "Stroke"
-            ) and not any(x in c for x in ("-", "+"))],
+            **sections,
             "url": url,
             "TotalDistance": total_distance,
             "summary": summary,
@@ -132,30 +281,51 @@ def merge_workout_data(by_workout: Dict[str, List[str]], links: Dict[str, str],
 
 
 # -------------------- Main -------------------- #
-def main():
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scrape Swim Dojo workouts into JSON")
+    parser.add_argument("--refresh", action="store_true", help="ignore cached data and refetch the archive and every workout page")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
     print("Starting JSON generation...")
     cache = load_cache()
     print("Cache loaded")
     
     # Load summaries from workouts.json
-    raw_workouts = json.loads(WORKOUTS_JSON.read_text(encoding="utf-8"))
-    summaries = {w["title"]: w.get("summary", "") for w in raw_workouts}
+    summaries = load_summaries(WORKOUTS_JSON)
     
-    soup = fetch_archive_html(ARCHIVE_URL)
-    print("Archive fetched")
-    
-    by_category, workout_links = extract_workouts_by_category(soup)
-    by_workout = invert_category_mapping(by_category)
+    archive_cache = {} if args.refresh else load_archive_cache()
+    connector = aiohttp.TCPConnector(limit=MAX_WORKERS, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tree, validators = await fetch_archive_html(session, ARCHIVE_URL, archive_cache)
+        if tree is None:
+            print("Archive unchanged, using cached parse")
+            by_workout, workout_links = archive_cache["by_workout"], archive_cache["workout_links"]
+            if validators and any(archive_cache.get(k) != v for k, v in validators.items()):
+                save_archive_cache(validators, by_workout, workout_links)
+        else:
+            print("Archive fetched")
+            _, by_workout, workout_links = extract_workouts_by_category(tree)
+            save_archive_cache(validators, by_workout, workout_links)
+
+        totals = await fetch_workout_totals(session, workout_links, list(by_workout), cache, args.refresh)
     
-    full_data = merge_workout_data(by_workout, workout_links, cache, summaries)
+    full_data = merge_workout_data(by_workout, workout_links, totals, summaries)
     
-    save_cache(cache)
-    OUTPUT_JSON.write_text(json.dumps(full_data, indent=2), encoding="utf-8")
+    if cache.dirty:
+        save_cache(cache)
+    # Sorted once here so consumers can use the [name, info] pairs as-is
+    items = sorted(full_data.items())
+    write_json(OUTPUT_JSON, items)
     
     print("✅ JSON files generated with summaries:")
     print(f" - {OUTPUT_JSON.resolve()}")
     print(f" - {CACHE_JSON.resolve()}")
+    print(f" - {ARCHIVE_CACHE_JSON.resolve()}")
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())